@@ -0,0 +1,141 @@
+#!/usr/bin/env python3
+"""bufferpool.py -- Pre-allocated capture buffers and a reusable composite canvas."""
+
+import os
+import threading
+import numpy as np
+from PIL import Image
+
+MB = 1024 * 1024
+
+# Bytes per pixel of frames and canvas: Pillow keeps RGB images as 4 bytes
+# per pixel, and RGBX is the widest mode Image.frombuffer() can share
+PIXEL_BYTES = 4
+
+
+class PoolExhausted(Exception):
+    """Raised when no buffer becomes free within the acquire timeout."""
+    pass
+
+
+class FramePool:
+    """
+    Fixed set of pre-allocated RGBX frame buffers (numpy arrays, height x width x 4).
+
+    Buffers are handed out with acquire() and must be given back with release();
+    acquire() blocks while all of them are in use, so the number of full-size
+    frames alive at once can never exceed `count`.
+    """
+
+    def __init__(self, size, count):
+        width, height = size
+        self.size = size
+        self._free = [np.empty((height, width, PIXEL_BYTES), dtype=np.uint8) for _ in range(count)]
+        self.count = count
+        self._cond = threading.Condition()
+        self.peak_in_use = 0
+
+    @property
+    def nbytes(self):
+        width, height = self.size
+        return self.count * width * height * PIXEL_BYTES
+
+    def in_use(self):
+        with self._cond:
+            return self.count - len(self._free)
+
+    def acquire(self, timeout=None):
+        """Take a free buffer, waiting up to `timeout` seconds for one."""
+        with self._cond:
+            if not self._cond.wait_for(lambda: self._free, timeout):
+                raise PoolExhausted("No free frame buffer after %ss" % timeout)
+            buf = self._free.pop()
+            self.peak_in_use = max(self.peak_in_use, self.count - len(self._free))
+            return buf
+
+    def release(self, buf):
+        """Return a buffer to the pool."""
+        with self._cond:
+            self._free.append(buf)
+            self._cond.notify()
+
+    def as_image(self, buf):
+        """
+        Wrap a buffer as a read-only RGBX PIL Image without copying the pixels.
+        The image is only valid until the buffer is released.
+        """
+        width, height = self.size
+        return Image.frombuffer('RGBX', (width, height), buf, 'raw', 'RGBX', 0, 1)
+
+
+class CanvasPool:
+    """
+    A single reusable RGB composite canvas.
+
+    The canvas is kept between sessions and only reallocated when a different
+    sheet size is requested (template or layout change).
+    """
+
+    def __init__(self):
+        self._canvas = None
+        self._in_use = False
+        self._cond = threading.Condition()
+
+    @property
+    def nbytes(self):
+        if self._canvas is None:
+            return 0
+        width, height = self._canvas.size
+        return width * height * PIXEL_BYTES
+
+    def acquire(self, size, timeout=None):
+        """Take the canvas, resized to `size` if necessary."""
+        with self._cond:
+            if not self._cond.wait_for(lambda: not self._in_use, timeout):
+                raise PoolExhausted("Composite canvas still in use after %ss" % timeout)
+            if self._canvas is None or self._canvas.size != tuple(size):
+                self._canvas = None  # drop the old one before allocating
+                self._canvas = Image.new('RGB', tuple(size))
+            self._in_use = True
+            return self._canvas
+
+    def release(self, canvas):
+        """Give the canvas back once it has been encoded."""
+        with self._cond:
+            self._in_use = False
+            self._cond.notify()
+
+
+def frame_pool_within_budget(size, wanted, canvas_bytes, budget_mb):
+    """
+    Return how many frame buffers of `size` fit alongside the canvas in
+    budget_mb, at most `wanted`. Raises MemoryError if not even one fits.
+
+    The budget covers the pooled buffers only; the decoded template, the
+    fitted strip, scaled thumbnails and the encoders' working memory come on
+    top and show up in memory_report()'s RSS.
+    """
+    width, height = size
+    frame_bytes = width * height * PIXEL_BYTES
+    count = min(wanted, int((budget_mb * MB - canvas_bytes) // frame_bytes))
+    if count < 1:
+        raise MemoryError("memory.pool_budget_mb=%s is too small for one %dx%d frame"
+                          % (budget_mb, width, height))
+    return count
+
+
+def rss_bytes():
+    """Current resident set size, from /proc where available."""
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError):
+        import resource
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+def memory_report(frame_pool, canvas_pool):
+    """One-line summary of pool sizes, peak usage and process RSS."""
+    return "frames %d/%d peak, %.1f MB + canvas %.1f MB, RSS %.0f MB" % (
+        frame_pool.peak_in_use, frame_pool.count, frame_pool.nbytes / float(MB),
+        canvas_pool.nbytes / float(MB), rss_bytes() / float(MB))
@@ -18,10 +18,35 @@ DEFAULTS = {
         'paper_tray_count': 18,
         'max_retries': 3,
         'retry_delay': 5,
+        'layout': 'grid',
+        'strip_template': '',
+        'copies': 1,
+        'cut_options': {},
+        'server': '',
+    },
+    'encoding': {
+        'workers': 2,
+        'queue_size': 4,
+        'quality': 90,
+        'subsampling': '4:2:0',
+        'archive_format': 'jpeg',
+        'progressive': False,
+    },
+    'memory': {
+        'frame_buffers': 2,
+        'pool_budget_mb': 32,  # frame buffers + composite canvas only
     },
     'state': {
         'images_printed': 0,
         'paper_bundles_loaded': 1,
+        'sheets_printed': 0,
+    },
+    'diagnostics': {
+        'profile_seconds': 30,
+        'stall_budget': 10,
+        'state_budgets': {},
+        'beat_budgets': {'printing': 30, 'print_wait': 300},
+        'slos': {},
     },
 }
 
@@ -40,6 +65,18 @@ def load_config():
                 if section in saved and isinstance(saved[section], dict):
                     config[section] = {**DEFAULTS[section], **saved[section]}
 
+            # Files from before sheet accounting: every print used one sheet
+            saved_state = saved.get('state')
+            if isinstance(saved_state, dict) and 'sheets_printed' not in saved_state:
+                config['state']['sheets_printed'] = config['state']['images_printed']
+
+            # memory.session_cap_mb was renamed: it only ever bounded the pools
+            saved_memory = saved.get('memory')
+            if isinstance(saved_memory, dict) and 'session_cap_mb' in saved_memory:
+                config['memory'].pop('session_cap_mb')
+                if 'pool_budget_mb' not in saved_memory:
+                    config['memory']['pool_budget_mb'] = saved_memory['session_cap_mb']
+
     return config
 
 
@@ -49,16 +86,63 @@ def save_config(config):
         yaml.dump(config, f, default_flow_style=False)
 
 
+class ConfigWatcher:
+    """Detect changes to booth.yml by polling its modification time."""
+
+    def __init__(self):
+        self._mtime = self._stat()
+
+    def _stat(self):
+        try:
+            st = os.stat(CONFIG_FILE)
+            return (st.st_mtime_ns, st.st_size)
+        except OSError:
+            return None
+
+    def changed(self):
+        """Return True once for every change to booth.yml since the last call."""
+        mtime = self._stat()
+        if mtime == self._mtime:
+            return False
+        self._mtime = mtime
+        return True
+
+
+def save_state(state):
+    """
+    Write only the runtime counters back to booth.yml.
+
+    The rest of the file is re-read from disk first, so settings an operator
+    edited while the booth was busy are kept rather than overwritten.
+    """
+    config = load_config()
+    config['state'] = dict(state)
+    save_config(config)
+
+
 def resolve_path(filename):
     """Resolve a filename relative to the project directory."""
     return os.path.join(PROJECT_DIR, filename)
 
 
+_image_scan_cache = {}
+
+
 def get_available_images(pattern=''):
-    """Return sorted list of .jpg files in the project root, optionally filtered by pattern."""
-    files = []
-    for f in os.listdir(PROJECT_DIR):
-        if f.lower().endswith(('.jpg', '.jpeg', '.png')) and os.path.isfile(os.path.join(PROJECT_DIR, f)):
-            if pattern == '' or pattern in f.lower():
-                files.append(f)
-    return sorted(files)
+    """Return sorted list of .jpg files in the project root, optionally filtered by pattern.
+
+    The directory listing is cached against the directory's mtime, so repeated
+    calls only rescan after a file has been added, removed or renamed.
+    """
+    mtime = os.stat(PROJECT_DIR).st_mtime_ns
+    cached = _image_scan_cache.get(PROJECT_DIR)
+    if cached is None or cached[0] != mtime:
+        names = []
+        with os.scandir(PROJECT_DIR) as entries:
+            for entry in entries:
+                if entry.name.lower().endswith(('.jpg', '.jpeg', '.png')) and entry.is_file():
+                    names.append(entry.name)
+        cached = (mtime, sorted(names))
+        _image_scan_cache[PROJECT_DIR] = cached
+
+    return [f for f in cached[1] if pattern == '' or pattern in f.lower()]
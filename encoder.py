@@ -0,0 +1,107 @@
+#!/usr/bin/env python3
+"""encoder.py -- Background image encoder pool for everything written to disk."""
+
+import os
+import queue
+import logging
+import threading
+from concurrent.futures import Future
+
+logger = logging.getLogger('photobooth.encoder')
+
+FORMATS = {
+    # archive_format: (PIL format, file extension)
+    'jpeg': ('JPEG', '.jpg'),
+    'webp': ('WEBP', '.webp'),
+}
+
+
+def save_options(fmt, quality=90, subsampling='4:2:0', progressive=False):
+    """PIL save() keyword arguments for a format name from FORMATS."""
+    if fmt == 'webp':
+        return {'quality': quality, 'method': 4}
+    return {
+        'quality': quality,
+        'subsampling': subsampling,
+        'progressive': progressive,
+        'optimize': progressive,  # optimize is cheap next to a progressive encode
+    }
+
+
+def release_after(count, callback):
+    """Return an on_done callable that runs `callback` on its count-th call."""
+    lock = threading.Lock()
+    remaining = [count]
+
+    def done():
+        with lock:
+            remaining[0] -= 1
+            last = remaining[0] == 0
+        if last:
+            callback()
+    return done
+
+
+class EncoderPool:
+    """
+    Encode PIL images to files on worker threads.
+
+    The job queue is bounded: submit() blocks once `queue_size` jobs are
+    waiting, which keeps pooled buffers from piling up behind a slow SD card.
+    Each job's `on_done` callback runs on the worker after the file is written
+    (or the encode failed), and is the place to release the source buffer.
+    """
+
+    def __init__(self, workers=2, queue_size=4):
+        self._queue = queue.Queue(maxsize=queue_size)
+        self._threads = []
+        for index in range(workers):
+            thread = threading.Thread(target=self._run, name='encoder-%d' % index, daemon=True)
+            thread.start()
+            self._threads.append(thread)
+
+    def submit(self, image, path, fmt='jpeg', options=None, on_done=None):
+        """
+        Queue `image` to be written to `path`. Returns a Future that resolves to
+        the path, or raises the encode error.
+        """
+        future = Future()
+        self._queue.put((image, path, FORMATS[fmt][0], options or {}, on_done, future))
+        return future
+
+    def pending(self):
+        """Number of jobs waiting for a worker."""
+        return self._queue.qsize()
+
+    def close(self):
+        """Wait for all queued encodes to finish and stop the workers."""
+        for _ in self._threads:
+            self._queue.put(None)
+        for thread in self._threads:
+            thread.join()
+        self._threads = []
+
+    def _run(self):
+        while True:
+            job = self._queue.get()
+            if job is None:
+                return
+            image, path, pil_format, options, on_done, future = job
+            tmp_path = path + '.tmp'
+            try:
+                image.save(tmp_path, pil_format, **options)
+                os.replace(tmp_path, path)
+                future.set_result(path)
+            except Exception as e:
+                logger.warning("Could not encode %s: %s", path, e)
+                try:
+                    os.remove(tmp_path)
+                except OSError:
+                    pass
+                future.set_exception(e)
+            finally:
+                if on_done:
+                    try:
+                        on_done()
+                    except Exception as e:
+                        logger.warning("Encoder callback failed for %s: %s", path, e)
@@ -0,0 +1,96 @@
+#!/usr/bin/env python3
+"""layout.py -- Print sheet layouts for compositing the session photos."""
+
+from PIL import ImageDraw, ImageOps
+
+# Strip size at 300 dpi
+STRIP_SIZE = (600, 1800)   # portrait 2x6
+
+# Photo slots for the classic 2x2 layout on a 6x4 template
+GRID_THUMB = (720, 540)
+GRID_SLOTS = [(40, 40), (40, 620), (1040, 40), (1040, 620)]
+
+# Photo slots inside a single 2x6 strip
+STRIP_THUMB = (540, 405)
+STRIP_SLOTS = [(30, 30), (30, 465), (30, 900), (30, 1335)]
+
+CUT_LINE_COLOR = (200, 200, 200)
+STRIP_BACKGROUND = (255, 255, 255)  # used when no strip template is configured
+
+LAYOUTS = {
+    # name: strips (or prints) per sheet
+    'grid': 1,
+    'double_strip': 2,
+}
+
+
+def prints_per_sheet(layout):
+    """Number of guest prints a single sheet yields for a layout."""
+    return LAYOUTS.get(layout, 1)
+
+
+def sheets_for_copies(layout, copies):
+    """Number of sheets needed to give a guest `copies` prints."""
+    per_sheet = prints_per_sheet(layout)
+    return max(1, -(-copies // per_sheet))
+
+
+def sheet_size(layout, template):
+    """Pixel size of the print sheet for a layout. `template` may be None for strips."""
+    if layout == 'double_strip':
+        return (STRIP_SIZE[0] * 2, STRIP_SIZE[1])
+    return template.size
+
+
+_strip_background = [None, None]  # (template, fitted strip) of the last call
+
+
+def _strip_for(template):
+    """Scale a strip template to strip size, cached for the last template used."""
+    if _strip_background[0] is not template:
+        _strip_background[1] = ImageOps.fit(template, STRIP_SIZE)
+        _strip_background[0] = template
+    return _strip_background[1]
+
+
+def start_sheet(layout, template, canvas):
+    """
+    Draw the layout background onto `canvas`, which must be sheet_size() big.
+    `template` must be an RGB image.
+
+    For 'double_strip', `template` is a portrait 2x6 strip design
+    (printing.strip_template), drawn twice side by side on a portrait 4x6
+    sheet. With no strip template the strips get a plain background.
+    """
+    if layout == 'double_strip':
+        if template is None:
+            canvas.paste(STRIP_BACKGROUND, (0, 0) + canvas.size)
+            return
+        strip = _strip_for(template)
+        canvas.paste(strip, (0, 0))
+        canvas.paste(strip, (STRIP_SIZE[0], 0))
+    else:
+        canvas.paste(template, (0, 0))
+
+
+def add_photo(layout, canvas, index, image):
+    """
+    Scale photo number `index` (0-3) into its slot(s) on the sheet.
+
+    The source image is not modified, so a full-size frame buffer can be
+    released as soon as this returns.
+    """
+    if layout == 'double_strip':
+        thumb = ImageOps.contain(image, STRIP_THUMB)
+        x, y = STRIP_SLOTS[index]
+        canvas.paste(thumb, (x, y))
+        canvas.paste(thumb, (STRIP_SIZE[0] + x, y))
+    else:
+        canvas.paste(ImageOps.contain(image, GRID_THUMB), GRID_SLOTS[index])
+
+
+def finish_sheet(layout, canvas, cut_line=True):
+    """Final touches. Without a printer cutter a guide line is drawn between strips."""
+    if layout == 'double_strip' and cut_line:
+        draw = ImageDraw.Draw(canvas)
+        draw.line([(STRIP_SIZE[0], 0), (STRIP_SIZE[0], STRIP_SIZE[1])], fill=CUT_LINE_COLOR)
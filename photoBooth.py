@@ -8,15 +8,23 @@ import os
 import logging
 import pygame
 import datetime
+import numpy as np
 import PIL.Image
 from PIL import Image
 from pygame.locals import *
-from picamera2 import Picamera2
+from picamera2 import Picamera2, MappedArray
 from libcamera import Transform
 
-from config import load_config, save_config, resolve_path
-from settings_gui import run_settings
-from printer import Printer
+from config import load_config, save_config, save_state, resolve_path, get_available_images, ConfigWatcher
+from settings_gui import run_settings, COLOR_PRESETS, _find_preset_name
+from printer import Printer, PrintTimeModel
+from printserver import RemotePrinter
+from profiling import Profiler
+from watchdog import Watchdog
+import layout
+from encoder import EncoderPool, FORMATS, save_options, release_after
+from bufferpool import (FramePool, CanvasPool, frame_pool_within_budget, memory_report,
+                        rss_bytes, MB, PIXEL_BYTES)
 
 logging.basicConfig(
     level=logging.INFO,
@@ -26,8 +34,8 @@ logging.basicConfig(
 # Constants
 SCREEN_W = 800
 SCREEN_H = 480
-THUMB_W = 720
-THUMB_H = 540
+CAPTURE_W = 1440
+CAPTURE_H = 1080
 GP_BUTTON = 15
 GP_LED = 13  # Ready indicator LED — lit when booth is waiting for input
 
@@ -51,9 +59,16 @@ config = run_settings()
 pygame.mixer.pre_init(44100, -16, 1, 1024 * 3)
 pygame.init()
 screen = pygame.display.set_mode((SCREEN_W, SCREEN_H), pygame.FULLSCREEN)
-surface = pygame.image.load(resolve_path(config['display']['screen_image']))
-surface = pygame.transform.scale(surface, (SCREEN_W, SCREEN_H))
-background = surface.convert()
+
+
+def load_background():
+    """Load and scale the configured screen background."""
+    surface = pygame.image.load(resolve_path(config['display']['screen_image']))
+    surface = pygame.transform.scale(surface, (SCREEN_W, SCREEN_H))
+    return surface.convert()
+
+
+background = load_background()
 
 # --- Step 3: Init camera ---
 camera = Picamera2()
@@ -66,7 +81,7 @@ preview_config = camera.create_preview_configuration(
 
 # Capture config: high resolution for the final photos
 capture_config = camera.create_still_configuration(
-    main={"size": (1440, 1080)},
+    main={"size": (CAPTURE_W, CAPTURE_H), "format": "XBGR8888"},  # RGBX byte order
     transform=Transform(hflip=True),
 )
 
@@ -74,16 +89,67 @@ camera.configure(preview_config)
 camera.start()
 camera_previewing = False
 
-# --- Step 4: Init printer ---
-booth_printer = Printer(
-    max_retries=config['printing']['max_retries'],
-    retry_delay=config['printing']['retry_delay'],
-)
+# --- Step 4: Init printer (local CUPS, or a shared print server) ---
+if config['printing']['server']:
+    booth_printer = RemotePrinter(config['printing']['server'])
+else:
+    booth_printer = Printer(
+        max_retries=config['printing']['max_retries'],
+        retry_delay=config['printing']['retry_delay'],
+        model=PrintTimeModel(resolve_path('.print_model.json')),
+    )
 printer_available = booth_printer.is_available()
 
 # Session folder
 foldername = datetime.datetime.now().strftime("%Y%m%d-%H%M%S")
 
+# On-demand profiler: `kill -USR1 <pid>` or Ctrl+P while waiting
+profiler = Profiler(foldername, seconds=config['diagnostics']['profile_seconds'])
+profiler.install_signal()
+
+
+def sheet_bytes():
+    """Size in bytes of the composite canvas for the configured template and layout."""
+    with PIL.Image.open(resolve_path(config['printing']['template_image'])) as template:
+        width, height = layout.sheet_size(config['printing']['layout'], template)
+    return width * height * PIXEL_BYTES
+
+
+# Capture buffers and composite canvas are pre-allocated and reused, with
+# their total held under memory.pool_budget_mb (other allocations not included)
+_frame_count = frame_pool_within_budget(
+    (CAPTURE_W, CAPTURE_H),
+    config['memory']['frame_buffers'],
+    sheet_bytes(),
+    config['memory']['pool_budget_mb'],
+)
+if _frame_count < config['memory']['frame_buffers']:
+    logging.warning("memory.pool_budget_mb allows only %d frame buffer(s)", _frame_count)
+frame_pool = FramePool((CAPTURE_W, CAPTURE_H), _frame_count)
+canvas_pool = CanvasPool()
+
+# Disk writes (raw shots, composites) are encoded on background workers
+image_encoder = EncoderPool(
+    workers=config['encoding']['workers'],
+    queue_size=config['encoding']['queue_size'],
+)
+
+# Stall watchdog and per-state latency tracking, fed by watchdog.beat()
+watchdog = Watchdog(
+    foldername,
+    budget=config['diagnostics']['stall_budget'],
+    state_budgets=config['diagnostics']['state_budgets'],
+    beat_budgets=config['diagnostics']['beat_budgets'],
+    slos=config['diagnostics']['slos'],
+)
+
+# Watches booth.yml so edits are applied without a restart
+config_watcher = ConfigWatcher()
+
+# Caches invalidated on config reload
+_fonts = {}
+_template_cache = {}
+
 
 #########################################
 # LED control
@@ -170,24 +236,205 @@ def test_gpio():
     return True
 
 
+#########################################
+# Live configuration
+
+
+def get_font(size):
+    """Return a cached pygame font of the given size."""
+    font = _fonts.get(size)
+    if font is None:
+        font = _fonts[size] = pygame.font.Font(None, size)
+    return font
+
+
+def get_template():
+    """
+    Return the print background for the current layout as an RGB PIL Image,
+    cached until the config changes. The double-strip layout uses
+    printing.strip_template and returns None when that is not set.
+    """
+    if config['printing']['layout'] == 'double_strip':
+        if not config['printing']['strip_template']:
+            return None
+        template_path = resolve_path(config['printing']['strip_template'])
+    else:
+        template_path = resolve_path(config['printing']['template_image'])
+    template = _template_cache.get(template_path)
+    if template is None:
+        _template_cache.clear()
+        template = PIL.Image.open(template_path).convert('RGB')
+        _template_cache[template_path] = template
+    return template
+
+
+def apply_config(new_config):
+    """Apply a changed config to the running booth, refreshing cached resources."""
+    global background
+
+    old_display = config['display']
+    old_printing = config['printing']
+    config.clear()
+    config.update(new_config)
+
+    if config['display'] != old_display:
+        _fonts.clear()
+        if config['display']['screen_image'] != old_display['screen_image']:
+            try:
+                background = load_background()
+            except Exception as e:
+                logging.warning("Could not load screen image %s: %s",
+                                config['display']['screen_image'], e)
+                config['display']['screen_image'] = old_display['screen_image']
+
+    profiler.seconds = config['diagnostics']['profile_seconds']
+    watchdog.budget = config['diagnostics']['stall_budget']
+    watchdog.state_budgets = dict(config['diagnostics']['state_budgets'])
+    watchdog.beat_budgets = dict(config['diagnostics']['beat_budgets'])
+    watchdog.slos = dict(config['diagnostics']['slos'])
+
+    if config['printing'] != old_printing:
+        _template_cache.clear()
+        booth_printer.max_retries = config['printing']['max_retries']
+        booth_printer.retry_delay = config['printing']['retry_delay']
+
+        # The frame pool is sized at startup; a bigger sheet may not fit beside it
+        try:
+            if frame_pool.nbytes + sheet_bytes() > config['memory']['pool_budget_mb'] * MB:
+                logging.warning("New sheet size exceeds memory.pool_budget_mb; "
+                                "restart the booth to resize the frame pool")
+        except Exception as e:
+            logging.warning("Could not check the pool budget: %s", e)
+
+    logging.info("Configuration reloaded")
+
+
+def check_config_reload():
+    """Reload booth.yml if it changed on disk."""
+    if not config_watcher.changed():
+        return
+    try:
+        new_config = load_config()
+    except Exception as e:
+        logging.warning("Ignoring unreadable booth.yml: %s", e)
+        return
+    if new_config != config:
+        apply_config(new_config)
+
+
+def settings_overlay():
+    """
+    On-booth settings editor. UP/DOWN selects a setting, LEFT/RIGHT changes it,
+    typing edits the banner text, ENTER saves and ESCAPE cancels.
+    """
+    images = get_available_images()
+    edit = {
+        'banner_text': config['display']['banner_text'],
+        'color': _find_preset_name(config['display']['text_color']),
+        'screen_image': config['display']['screen_image'],
+        'template_image': config['printing']['template_image'],
+        'paper_tray_count': config['printing']['paper_tray_count'],
+        'layout': config['printing']['layout'],
+        'strip_template': config['printing']['strip_template'],
+    }
+    rows = [
+        ('banner_text', "Banner"),
+        ('color', "Color"),
+        ('screen_image', "Screen BG"),
+        ('template_image', "Template"),
+        ('paper_tray_count', "Tray Count"),
+        ('layout', "Layout"),
+        ('strip_template', "Strip Tmpl"),
+    ]
+    colors = list(COLOR_PRESETS.keys())
+
+    def cycle(options, current, step):
+        if not options:
+            return current
+        index = options.index(current) if current in options else -1
+        return options[(index + step) % len(options)]
+
+    selected = 0
+    while True:
+        watchdog.beat('settings')
+        for event in pygame.event.get():
+            if event.type == QUIT:
+                return
+            if event.type != KEYDOWN:
+                continue
+            key = rows[selected][0]
+            step = 0
+            if event.key == K_ESCAPE:
+                return
+            elif event.key == K_RETURN:
+                new_config = load_config()
+                new_config['state'] = config['state']
+                new_config['display']['banner_text'] = edit['banner_text']
+                new_config['display']['text_color'] = COLOR_PRESETS[edit['color']]
+                new_config['display']['screen_image'] = edit['screen_image']
+                new_config['printing']['template_image'] = edit['template_image']
+                new_config['printing']['paper_tray_count'] = edit['paper_tray_count']
+                new_config['printing']['layout'] = edit['layout']
+                new_config['printing']['strip_template'] = edit['strip_template']
+                save_config(new_config)
+                check_config_reload()
+                return
+            elif event.key == K_UP:
+                selected = (selected - 1) % len(rows)
+            elif event.key == K_DOWN:
+                selected = (selected + 1) % len(rows)
+            elif event.key == K_LEFT:
+                step = -1
+            elif event.key == K_RIGHT:
+                step = 1
+            elif key == 'banner_text':
+                if event.key == K_BACKSPACE:
+                    edit['banner_text'] = edit['banner_text'][:-1]
+                elif event.unicode and event.unicode.isprintable():
+                    edit['banner_text'] += event.unicode
+
+            if step:
+                if key == 'color':
+                    edit['color'] = cycle(colors, edit['color'], step)
+                elif key in ('screen_image', 'template_image'):
+                    edit[key] = cycle(images, edit[key], step)
+                elif key == 'paper_tray_count':
+                    edit[key] = min(50, max(1, edit[key] + step))
+                elif key == 'layout':
+                    edit[key] = cycle(list(layout.LAYOUTS), edit[key], step)
+                elif key == 'strip_template':
+                    edit[key] = cycle([''] + images, edit[key], step)
+
+        screen.fill((20, 20, 20))
+        font = get_font(40)
+        screen.blit(font.render("Settings  (ENTER save, ESC cancel)", 1, (236, 240, 241)), (20, 20))
+        for i, (key, label) in enumerate(rows):
+            color = (241, 196, 15) if i == selected else (236, 240, 241)
+            line = "%s:  %s" % (label, edit[key] if edit[key] != '' else "(none)")
+            screen.blit(font.render(line, 1, color), (40, 90 + i * 50))
+        pygame.display.flip()
+        time.sleep(0.05)
+
+
 #########################################
 # Functions
 
 
 def UpdateDisplay(Message, SmallText=None):
     """Render message text and banner text onto the screen background."""
+    watchdog.beat()
     if SmallText is None:
         SmallText = config['display']['banner_text']
 
     text_color = tuple(config['display']['text_color'])
     local_screen = background.copy()
 
-    smallfont = pygame.font.Font(None, 50)
+    smallfont = get_font(50)
     rendered_small = smallfont.render(SmallText, 1, text_color)
     local_screen.blit(rendered_small, (10, 445))
 
     if Message != "":
-        font = pygame.font.Font(None, 180)
+        font = get_font(180)
         text = font.render(Message, 1, text_color)
         textpos = text.get_rect()
         textpos.centerx = background.get_rect().centerx
@@ -198,16 +445,27 @@ def UpdateDisplay(Message, SmallText=None):
     pygame.display.flip()
 
 
+def session_sheets():
+    """Number of sheets one session uses with the current layout and copies."""
+    return layout.sheets_for_copies(config['printing']['layout'],
+                                    config['printing']['copies'])
+
+
 def check_paper():
     """Check if paper is available via counter and printer status."""
     if not printer_available:
         return True  # No printer — no paper problem
 
-    images_printed = config['state']['images_printed']
+    # Shared printers: the paper is on the server, so only it can tell
+    if isinstance(booth_printer, RemotePrinter):
+        return booth_printer.check_paper_status()
+
+    sheets_printed = config['state']['sheets_printed']
     tray_count = config['printing']['paper_tray_count']
     bundles = config['state']['paper_bundles_loaded']
 
-    if images_printed >= tray_count * bundles:
+    # Out of paper if the next session's sheets would not fit in the tray
+    if sheets_printed + session_sheets() > tray_count * bundles:
         return False
 
     return booth_printer.check_paper_status()
@@ -222,22 +480,26 @@ def outofpaper():
 
     while not check_paper():
         # Flash SOS (~3.6s) then pause (~26s) for a 30s cycle
+        watchdog.beat('out_of_paper')
         led_sos()
 
         # Wait 26 seconds, checking for input every 0.5s so spacebar is responsive
         for _ in range(52):
+            watchdog.beat('out_of_paper')
             for event in pygame.event.get():
                 if event.type == QUIT:
                     return
                 elif event.type == KEYDOWN:
                     if event.key == K_SPACE:
                         config['state']['paper_bundles_loaded'] += 1
-                        save_config(config)
+                        save_state(config['state'])
                         print("Paper tray was reloaded")
                     if event.key == K_ESCAPE:
                         print("Ending because ESCAPE key was pressed")
+                        image_encoder.close()
                         pygame.quit()
                         exit(0)
+            check_config_reload()
             if check_paper():
                 return
             time.sleep(0.5)
@@ -278,6 +540,7 @@ def waitingforbutton():
 
     loopct = 0
     while loopct < 150:
+        watchdog.beat('ready')
         loopct += 1
         if loopct < 10:
             Message = "Ready"
@@ -291,8 +554,15 @@ def waitingforbutton():
                 if event.key == K_DOWN:
                     buttonpressed()
                     loopct = 100000
+                if event.key == K_F2:
+                    settings_overlay()
+                    loopct = 0
+                if event.key == K_p and event.mod & KMOD_CTRL:
+                    profiler.start()
                 if event.key == K_ESCAPE:
                     print("Ending because ESCAPE key was pressed")
+                    logging.info("Latency summary:\n%s", watchdog.report())
+                    image_encoder.close()
                     pygame.quit()
                     exit(0)
             elif event.type == MOUSEBUTTONDOWN:
@@ -304,14 +574,17 @@ def waitingforbutton():
             buttonpressed()
             loopct = 100000
 
+        if loopct % 20 == 0:
+            check_config_reload()
+
         # Draw camera preview with text overlay
         show_camera_preview()
         text_color = tuple(config['display']['text_color'])
-        smallfont = pygame.font.Font(None, 50)
+        smallfont = get_font(50)
         rendered_prompt = smallfont.render(prompt, 1, text_color)
         screen.blit(rendered_prompt, (10, 445))
         if Message.strip():
-            font = pygame.font.Font(None, 180)
+            font = get_font(180)
             text = font.render(Message, 1, text_color)
             textpos = text.get_rect()
             textpos.centerx = SCREEN_W // 2
@@ -333,6 +606,7 @@ def instructions():
 
 def buttonpressed():
     """Handle button press: show instructions then take pictures."""
+    watchdog.beat('capture')
     led_off()  # LED off during capture and printing
     instructions()
     takepictures()
@@ -347,24 +621,53 @@ def countdown(text):
         time.sleep(0.75)
 
 
-def take_picture(img, sub):
-    """Capture a single photo, return PIL Image."""
+def capture_frame(buf):
+    """Switch to high-res capture mode and copy one frame into a pooled RGBX buffer."""
+    request = camera.switch_mode_and_capture_request(capture_config)
+    try:
+        with MappedArray(request, 'main') as mapped:
+            np.copyto(buf, mapped.array[:CAPTURE_H, :CAPTURE_W, :PIXEL_BYTES])
+    finally:
+        request.release()
+
+
+def archive_settings():
+    """Return (format, file extension, PIL save options) for archived images."""
+    enc = config['encoding']
+    fmt = enc['archive_format'] if enc['archive_format'] in FORMATS else 'jpeg'
+    return fmt, FORMATS[fmt][1], save_options(fmt, enc['quality'], enc['subsampling'],
+                                              enc['progressive'])
+
+
+def take_picture(img, sub, canvas, buf):
+    """
+    Capture a single photo into `buf`, place it on the composite canvas, and
+    queue it for saving. Takes ownership of the pooled buffer.
+    """
     global camera_previewing
-    filename = "image%d_%d.jpg" % (img, sub)
+    fmt, ext, options = archive_settings()
+    filename = "image%d_%d%s" % (img, sub, ext)
     filepath = os.path.join(foldername, filename)
-    UpdateDisplay("SMILE!")
-    time.sleep(0.75)
-    pygame.mixer.music.load(resolve_path('camera.mp3'))
-    pygame.mixer.music.play(0)
-    # Switch to high-res capture mode and take the photo
-    camera.switch_mode_and_capture_file(capture_config, filepath)
-    camera_previewing = False
-    return PIL.Image.open(filepath)
+    try:
+        UpdateDisplay("SMILE!")
+        time.sleep(0.75)
+        pygame.mixer.music.load(resolve_path('camera.mp3'))
+        pygame.mixer.music.play(0)
+        capture_frame(buf)
+        camera_previewing = False
+        photo = frame_pool.as_image(buf)
+        layout.add_photo(config['printing']['layout'], canvas, sub, photo)
+    except Exception:
+        frame_pool.release(buf)
+        raise
+    # The encoder reads the pooled pixels directly, so it owns the buffer
+    # from here and releases it once the file is written
+    image_encoder.submit(photo, filepath, fmt, options,
+                         on_done=lambda: frame_pool.release(buf))
 
 
 def takepictures():
     """Take 4 pictures, composite onto template, and print."""
-    images = []
     picture_labels = [
         "Picture Number One",
         "Picture Number Two",
@@ -374,40 +677,83 @@ def takepictures():
 
     img_number = config['state']['images_printed'] + 1
 
-    for sub in range(4):
-        UpdateDisplay("Get Ready!", picture_labels[sub])
-        time.sleep(2)
-        countdown(picture_labels[sub])
-        images.append(take_picture(img_number, sub))
-
-    # Load the template and composite the 4 photos
-    template_path = resolve_path(config['printing']['template_image'])
-    bgimage = PIL.Image.open(template_path)
-
-    for x in range(4):
-        images[x].thumbnail((THUMB_W, THUMB_H))
-
-    bgimage.paste(images[0], (40, 40))
-    bgimage.paste(images[1], (40, 620))
-    bgimage.paste(images[2], (1040, 40))
-    bgimage.paste(images[3], (1040, 620))
-
+    # Each photo is composited onto the reusable canvas as soon as it is taken
+    sheet_layout = config['printing']['layout']
+    template = get_template()
+    cut_options = config['printing']['cut_options']
+    canvas = canvas_pool.acquire(layout.sheet_size(sheet_layout, template))
+    try:
+        layout.start_sheet(sheet_layout, template, canvas)
+        for sub in range(4):
+            UpdateDisplay("Get Ready!", picture_labels[sub])
+            # Any wait for a free buffer (encoder behind on a slow card)
+            # happens here, not between the shutter sound and the capture
+            buf = frame_pool.acquire()
+            try:
+                time.sleep(2)
+                countdown(picture_labels[sub])
+            except Exception:
+                frame_pool.release(buf)
+                raise
+            take_picture(img_number, sub, canvas, buf)
+        layout.finish_sheet(sheet_layout, canvas, cut_line=not cut_options)
+    except Exception:
+        canvas_pool.release(canvas)
+        raise
+
+    # The print file is always a baseline JPEG; a differing archive format
+    # gets its own copy. The canvas is released after the last encode.
+    enc = config['encoding']
     Final_Image_Name = os.path.join(foldername, "Final_%d.jpg" % img_number)
-    bgimage.save(Final_Image_Name)
+    fmt, ext, archive_options = archive_settings()
+    extra_archive = fmt != 'jpeg' or enc['progressive']
+    release = release_after(2 if extra_archive else 1, lambda: canvas_pool.release(canvas))
+    final_encoded = image_encoder.submit(
+        canvas, Final_Image_Name, 'jpeg',
+        save_options('jpeg', enc['quality'], enc['subsampling']), on_done=release)
+    if extra_archive:
+        archive_name = os.path.join(foldername, "Final_%d_archive%s" % (img_number, ext))
+        image_encoder.submit(canvas, archive_name, fmt, archive_options, on_done=release)
+    logging.info("Memory: %s, %d encode(s) queued",
+                 memory_report(frame_pool, canvas_pool), image_encoder.pending())
+
+    # Print or save; either way the composite has to be on disk first
+    watchdog.beat('printing' if printer_available else 'saving')
+    try:
+        final_encoded.result()
+    except Exception as e:
+        logging.error("Could not write %s: %s", Final_Image_Name, e)
+        UpdateDisplay("Print Failed!" if printer_available else "Save Failed!",
+                      "Press button to try again")
+        time.sleep(3)
+        return
 
-    # Print or save
     if printer_available:
         def on_print_status(msg):
             UpdateDisplay(msg)
 
+        def on_print_submitted():
+            watchdog.beat('print_wait')
+
+        def on_print_eta(seconds):
+            UpdateDisplay("Printing...", "Your print is ready in ~%ds" % seconds)
+
+        sheets = session_sheets()
+        job_options = cut_options if sheet_layout == 'double_strip' else None
         success = booth_printer.print_file(
             os.path.abspath(Final_Image_Name),
             on_status=on_print_status,
+            copies=sheets,
+            options=job_options,
+            on_eta=on_print_eta,
+            on_submitted=on_print_submitted,
         )
 
         if success:
             config['state']['images_printed'] += 1
-            save_config(config)
+            config['state']['sheets_printed'] += sheets
+            save_state(config['state'])
+            check_config_reload()
             UpdateDisplay("Done!")
             time.sleep(2)
         else:
@@ -420,45 +766,57 @@ def takepictures():
 
 ##############################################################################
 
-# Create session folder
-if not os.path.exists(foldername):
-    os.mkdir(foldername)
-
-# Startup welcome messages
-UpdateDisplay("Welcome!")
-time.sleep(5)
-UpdateDisplay("to the")
-time.sleep(1.75)
-UpdateDisplay("PhotoBooth!")
-time.sleep(3.5)
-UpdateDisplay("Loading...")
-time.sleep(0.75)
-
-# --- Step 6: Diagnostics ---
-UpdateDisplay("Testing...", "Checking hardware")
-time.sleep(0.5)
-test_gpio()
-
-if gpio_available:
-    # Flash the LED 3 times to confirm it works
-    for _ in range(3):
-        led_on()
-        time.sleep(0.2)
-        led_off()
-        time.sleep(0.2)
-    UpdateDisplay("Button OK", "GPIO test passed")
-else:
-    UpdateDisplay("No Button", "Using touchscreen mode")
-time.sleep(2)
+def main():
+    """Run the booth: startup screens, hardware diagnostics, then the main loop."""
+    # Create session folder
+    if not os.path.exists(foldername):
+        os.mkdir(foldername)
+
+    # Startup welcome messages
+    UpdateDisplay("Welcome!")
+    time.sleep(5)
+    UpdateDisplay("to the")
+    time.sleep(1.75)
+    UpdateDisplay("PhotoBooth!")
+    time.sleep(3.5)
+    UpdateDisplay("Loading...")
+    time.sleep(0.75)
 
-if printer_available:
-    UpdateDisplay("Printer OK", booth_printer._printer_name)
-else:
-    UpdateDisplay("No Printer", "Photos will be saved only")
-time.sleep(2)
+    # --- Step 6: Diagnostics ---
+    UpdateDisplay("Testing...", "Checking hardware")
+    time.sleep(0.5)
+    test_gpio()
 
-# Main loop
-waitingforbutton()
-while True:
-    print("Loop cycle - restarting waitingforbutton")
+    if gpio_available:
+        # Flash the LED 3 times to confirm it works
+        for _ in range(3):
+            led_on()
+            time.sleep(0.2)
+            led_off()
+            time.sleep(0.2)
+        UpdateDisplay("Button OK", "GPIO test passed")
+    else:
+        UpdateDisplay("No Button", "Using touchscreen mode")
+    time.sleep(2)
+
+    if printer_available:
+        UpdateDisplay("Printer OK", booth_printer._printer_name)
+    else:
+        UpdateDisplay("No Printer", "Photos will be saved only")
+    time.sleep(2)
+
+    logging.info("Memory: %s", memory_report(frame_pool, canvas_pool))
+    UpdateDisplay("Memory OK", "%d MB pooled, RSS %d MB" % (
+        frame_pool.nbytes // MB, rss_bytes() // MB))
+    time.sleep(2)
+
+    # Main loop
+    watchdog.start()
     waitingforbutton()
+    while True:
+        print("Loop cycle - restarting waitingforbutton")
+        waitingforbutton()
+
+
+if __name__ == '__main__':
+    main()
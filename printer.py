@@ -1,9 +1,14 @@
 #!/usr/bin/env python3
 """printer.py -- Robust CUPS printing with error handling and retry logic."""
 
+import os
 import cups
+import json
+import fcntl
 import time
 import logging
+import tempfile
+import threading
 
 logger = logging.getLogger('photobooth.printer')
 
@@ -19,17 +24,135 @@ JOB_COMPLETED = 9
 FAILED_STATES = {JOB_CANCELED, JOB_ABORTED, JOB_STOPPED, JOB_HELD}
 
 
+LOCAL_URI_PREFIXES = ('usb://', 'serial:', 'parallel:')
+
+# Job polling bounds in seconds
+MIN_POLL_INTERVAL = 1
+MAX_POLL_INTERVAL = 10
+
+# Prior for printers with no history: seconds per sheet and its spread
+DEFAULT_SHEET_SECONDS = 45.0
+DEFAULT_SHEET_STDDEV = 15.0
+TIMEOUT_SLACK = 30.0
+MIN_JOB_TIMEOUT = 120.0  # never give up on a job sooner, however tight the history
+
+
 class PrintError(Exception):
     """Raised when printing fails after all retries."""
     pass
 
 
+class PrintTimeModel:
+    """
+    Learned seconds-per-sheet for each printer, as an exponentially weighted
+    mean and variance so the estimate follows a printer as it warms up or
+    its media changes. Samples are submit-to-complete times, so spooling and
+    filtering are part of the estimate. Optionally persisted as JSON between
+    runs.
+    """
+
+    ALPHA = 0.3
+
+    def __init__(self, path=None):
+        self.path = path
+        self._lock = threading.Lock()
+        self._stats = {}
+        if path and os.path.exists(path):
+            try:
+                with open(path) as f:
+                    self._stats = json.load(f)
+            except (OSError, ValueError) as e:
+                logger.warning("Ignoring unreadable print model %s: %s", path, e)
+
+    def estimate(self, printer_name):
+        """Return (mean, stddev, samples) seconds per sheet for a printer."""
+        with self._lock:
+            stats = self._stats.get(printer_name)
+        if not stats:
+            return DEFAULT_SHEET_SECONDS, DEFAULT_SHEET_STDDEV, 0
+        return stats['mean'], stats['var'] ** 0.5, stats['n']
+
+    def expected(self, printer_name, sheets=1, sheets_ahead=0):
+        """Expected seconds until a job of `sheets` finishes behind `sheets_ahead` queued sheets."""
+        mean, _stddev, _n = self.estimate(printer_name)
+        return mean * (sheets + sheets_ahead)
+
+    def timeout(self, printer_name, sheets=1, sheets_ahead=0):
+        """
+        Time after which a job should be treated as lost. The learned spread
+        shrinks when recent prints took similar times, so the timeout never
+        drops below twice the expected time or MIN_JOB_TIMEOUT.
+        """
+        _mean, stddev, _n = self.estimate(printer_name)
+        count = sheets + sheets_ahead
+        expected = self.expected(printer_name, sheets, sheets_ahead)
+        return max(MIN_JOB_TIMEOUT, 2 * expected,
+                   expected + 4 * stddev * count ** 0.5 + TIMEOUT_SLACK)
+
+    def record(self, printer_name, sheet_seconds):
+        """Add one observed seconds-per-sheet measurement."""
+        with self._lock:
+            stats = self._stats.get(printer_name)
+            if not stats:
+                stats = {'mean': sheet_seconds, 'var': (sheet_seconds * 0.25) ** 2, 'n': 0}
+            else:
+                diff = sheet_seconds - stats['mean']
+                stats['mean'] += self.ALPHA * diff
+                stats['var'] = (1 - self.ALPHA) * (stats['var'] + self.ALPHA * diff * diff)
+            stats['n'] += 1
+            self._stats[printer_name] = stats
+            if self.path:
+                self._save(printer_name)
+        logger.info("Print model %s: %.1fs/sheet (n=%d)",
+                    printer_name, stats['mean'], stats['n'])
+
+    def _save(self, printer_name):
+        # Called with the lock held. A print server and a booth on one host
+        # share the file but learn different printers, so only this printer's
+        # entry is merged into what is on disk, under an exclusive file lock.
+        # The unique temp file keeps readers from seeing a half-written file.
+        try:
+            with open(self.path + '.lock', 'a') as lock_file:
+                fcntl.flock(lock_file, fcntl.LOCK_EX)
+                try:
+                    with open(self.path) as f:
+                        saved = json.load(f)
+                except (OSError, ValueError):
+                    saved = {}
+                if not isinstance(saved, dict):
+                    saved = {}
+                saved[printer_name] = self._stats[printer_name]
+
+                fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(os.path.abspath(self.path)),
+                                                prefix='.print_model-')
+                try:
+                    with os.fdopen(fd, 'w') as f:
+                        json.dump(saved, f)
+                    os.replace(tmp_path, self.path)
+                except Exception:
+                    os.unlink(tmp_path)
+                    raise
+        except OSError as e:
+            logger.warning("Could not save print model: %s", e)
+
+
+def find_local_printers():
+    """Return the names of all local (USB, serial, parallel) CUPS printers."""
+    conn = cups.Connection()
+    return sorted(name for name, props in conn.getPrinters().items()
+                  if props.get('device-uri', '').startswith(LOCAL_URI_PREFIXES))
+
+
 class Printer:
-    def __init__(self, max_retries=3, retry_delay=5):
+    def __init__(self, max_retries=3, retry_delay=5, printer_name=None, model=None):
         self.max_retries = max_retries
         self.retry_delay = retry_delay
+        self.model = model or PrintTimeModel()
         self._conn = None
-        self._printer_name = None
+        self._printer_name = printer_name
+        # A printer named by the caller (e.g. one of the print server's pool)
+        # must never be swapped for another queue behind its back
+        self._fixed_name = printer_name is not None
 
     def is_available(self):
         """Check if a local (USB) printer is connected and reachable. Returns True/False."""
@@ -41,8 +164,10 @@ class Printer:
 
             # Only use local printers (USB, serial, parallel) — skip network printers
             for name, props in printers.items():
+                if self._printer_name and name != self._printer_name:
+                    continue
                 uri = props.get('device-uri', '')
-                if uri.startswith(('usb://', 'serial:', 'parallel:')):
+                if uri.startswith(LOCAL_URI_PREFIXES):
                     self._conn = conn
                     self._printer_name = name
                     logger.info("Local printer found: %s (%s)", name, uri)
@@ -67,7 +192,11 @@ class Printer:
         printers = self._conn.getPrinters()
         if not printers:
             raise PrintError("No printers found")
-        self._printer_name = next(iter(printers.keys()))
+        if self._printer_name not in printers:
+            if self._fixed_name:
+                self._conn = None
+                raise PrintError("Printer %s not found" % self._printer_name)
+            self._printer_name = next(iter(printers.keys()))
         logger.info("Connected to printer: %s", self._printer_name)
         return self._conn
 
@@ -99,26 +228,73 @@ class Printer:
                     logger.warning("Could not cancel job %d: %s", job_id, e)
         return cleared
 
-    def _wait_for_job(self, job_id, timeout=120):
+    def _sheets_ahead(self, conn, job_id):
+        """Number of sheets (copies) of unfinished jobs queued on this printer before job_id."""
+        try:
+            jobs = conn.getJobs(which_jobs='not-completed',
+                                requested_attributes=['job-id', 'job-printer-uri', 'copies'])
+        except Exception:
+            return 0
+        suffix = '/printers/%s' % self._printer_name
+        return sum(max(1, int(info.get('copies', 1))) for other_id, info in jobs.items()
+                   if other_id < job_id
+                   and info.get('job-printer-uri', suffix).endswith(suffix))
+
+    def _job_duration(self, conn, job_id):
+        """Seconds from submission to completion of a finished job, or None if unknown."""
+        try:
+            attrs = conn.getJobAttributes(job_id)
+            started = attrs.get('time-at-creation')
+            finished = attrs.get('time-at-completed')
+            if started and finished and finished >= started:
+                return finished - started
+        except Exception:
+            pass
+        return None
+
+    def _wait_for_job(self, job_id, timeout=None, sheets=1, on_eta=None):
         """
         Poll job status until it completes or fails.
-        Returns True if job completed successfully, False otherwise.
+
+        The poll schedule and timeout come from the learned print time for this
+        printer and the sheets queued ahead: polls are sparse while the
+        job cannot be done yet, frequent around the expected finish, then back
+        off if it runs late. on_eta(seconds) is called with the estimated time
+        left whenever the estimate changes; once the job is past its expected
+        finish the estimate is pushed out one standard deviation at a time.
+
+        Returns True if job completed successfully, False if it failed, or None
+        if it timed out while CUPS still reports it pending or processing.
         """
         conn = self._connect()
+        ahead = self._sheets_ahead(conn, job_id)
+        expected = self.model.expected(self._printer_name, sheets, ahead)
+        if timeout is None:
+            timeout = self.model.timeout(self._printer_name, sheets, ahead)
+        _mean, stddev, _n = self.model.estimate(self._printer_name)
+        late_step = max(MIN_POLL_INTERVAL * 5, stddev * (sheets + ahead) ** 0.5)
+        finish_estimate = expected
         start = time.time()
-        poll_interval = 2
+        late_interval = MIN_POLL_INTERVAL
+        last_eta = None
+        state = None
+        logger.info("Job %d: %d sheet(s) ahead, expect ~%.0fs, timeout %.0fs",
+                    job_id, ahead, expected, timeout)
 
         while time.time() - start < timeout:
+            elapsed = time.time() - start
             try:
                 jobs = conn.getJobs(which_jobs='all')
                 if job_id not in jobs:
                     logger.info("Job %d no longer in queue (assumed completed)", job_id)
+                    self._learn(conn, job_id, sheets + ahead, start)
                     return True
 
                 state = jobs[job_id].get('job-state', 0)
 
                 if state == JOB_COMPLETED:
                     logger.info("Job %d completed successfully", job_id)
+                    self._learn(conn, job_id, sheets + ahead, start)
                     return True
                 elif state in FAILED_STATES:
                     msg = jobs[job_id].get('job-state-message', 'unknown')
@@ -127,7 +303,7 @@ class Printer:
                         try:
                             conn.setJobHoldUntil(job_id, 'no-hold')
                             logger.info("Resumed held job %d", job_id)
-                            time.sleep(poll_interval)
+                            time.sleep(MIN_POLL_INTERVAL)
                             continue
                         except Exception:
                             pass
@@ -139,28 +315,74 @@ class Printer:
                 logger.warning("Error polling job %d: %s", job_id, e)
                 self._conn = None
 
-            time.sleep(poll_interval)
-
+            remaining = expected - elapsed
+            if on_eta:
+                # Running late: expect it one more standard deviation out
+                while finish_estimate - elapsed < 1:
+                    finish_estimate += late_step
+                eta = int(finish_estimate - elapsed + 0.5)
+                if eta != last_eta:
+                    last_eta = eta
+                    on_eta(eta)
+
+            if remaining > MAX_POLL_INTERVAL:
+                interval = min(MAX_POLL_INTERVAL, remaining / 2.0)
+            elif remaining > 0:
+                interval = MIN_POLL_INTERVAL
+            else:
+                interval = late_interval
+                late_interval = min(MAX_POLL_INTERVAL, late_interval * 1.5)
+            time.sleep(min(interval, max(0.1, timeout - elapsed)))
+
+        if state in (JOB_PENDING, JOB_PROCESSING):
+            logger.warning("Job %d still %s after %ds, leaving it queued", job_id,
+                           'processing' if state == JOB_PROCESSING else 'pending', timeout)
+            return None
         logger.error("Job %d timed out after %ds", job_id, timeout)
         return False
 
-    def print_file(self, filepath, on_status=None):
+    def _learn(self, conn, job_id, sheets, submitted):
+        """
+        Feed a finished job's print time into the model. `sheets` includes
+        the jobs that were queued ahead of it, since their printing is part
+        of its submit-to-complete time.
+        """
+        duration = self._job_duration(conn, job_id)
+        if duration is None:
+            duration = time.time() - submitted
+        if duration:
+            self.model.record(self._printer_name, duration / float(max(1, sheets)))
+
+    def print_file(self, filepath, on_status=None, copies=1, options=None, on_eta=None,
+                   on_submitted=None):
         """
         Print a file with retry logic.
 
         Args:
             filepath: absolute path to the image file
             on_status: optional callback(message: str) for display updates
+            copies: number of sheets, sent as the IPP copies attribute
+            options: optional dict of extra CUPS job options (e.g. cutter settings)
+            on_eta: optional callback(seconds: int) with the estimated time to finish
+            on_submitted: optional callback() once CUPS has accepted the job
 
         Returns:
-            True if print succeeded, False if all retries exhausted.
+            True if print succeeded (or CUPS still has the job after the
+            timeout), False if all retries exhausted.
         """
         def status(msg):
             logger.info(msg)
             if on_status:
                 on_status(msg)
 
-        self.clear_failed_jobs()
+        job_options = {str(k): str(v) for k, v in (options or {}).items()}
+        if copies > 1:
+            job_options['copies'] = str(copies)
+
+        try:
+            self.clear_failed_jobs()
+        except Exception as e:
+            logger.warning("Could not clear failed jobs: %s", e)
 
         for attempt in range(1, self.max_retries + 1):
             try:
@@ -179,13 +401,21 @@ class Printer:
                         logger.warning("Could not re-enable printer: %s", e)
 
                 job_id = conn.printFile(
-                    self._printer_name, filepath, "PhotoBooth", {}
+                    self._printer_name, filepath, "PhotoBooth", job_options
                 )
                 status("Printing...")
+                if on_submitted:
+                    on_submitted()
 
-                if self._wait_for_job(job_id):
+                result = self._wait_for_job(job_id, sheets=copies, on_eta=on_eta)
+                if result:
                     status("Print complete!")
                     return True
+                elif result is None:
+                    # CUPS is still working on it; cancelling and resubmitting
+                    # would only risk a second copy
+                    status("Print is taking longer than usual...")
+                    return True
                 else:
                     status("Print attempt %d failed" % attempt)
                     try:
@@ -0,0 +1,493 @@
+#!/usr/bin/env python3
+"""printserver.py -- Shared print server so several booths can use one printer pool.
+
+One host runs the server and owns the printers; booths use RemotePrinter in
+place of printer.Printer (set printing.server in booth.yml). Composites are
+streamed over a Unix or TCP socket and job status is pushed back as it changes.
+
+Protocol: the client sends one JSON header line, followed for 'print' by
+exactly `size` bytes of image data. The server replies with JSON lines:
+{"status": msg} or {"eta": seconds} while the job runs, {"keepalive": true}
+at least every KEEPALIVE_INTERVAL seconds while it is queued or printing,
+then {"done": true, "ok": bool}.
+
+There is no authentication: TCP clients must come from a private network,
+uploads and copies are capped and only the cutter/media options in
+ALLOWED_JOB_OPTIONS reach CUPS.
+
+    ./printserver.py --listen unix:/tmp/photobooth-print.sock
+    ./printserver.py --listen tcp:192.168.1.10:9100
+    ./printserver.py --simulate --booths 3 --printers 2 --jobs 20
+"""
+
+import os
+import sys
+import json
+import time
+import queue
+import socket
+import logging
+import argparse
+import tempfile
+import ipaddress
+import threading
+
+logger = logging.getLogger('photobooth.printserver')
+
+CHUNK_SIZE = 64 * 1024
+RETRY_HANDOFF_DELAY = 0.5  # seconds a worker waits after passing on a job it already failed
+
+# Limits on what a client may ask for; the server has no authentication, so
+# only these CUPS options (cutter / media selection) are passed through.
+MAX_UPLOAD_BYTES = 50 * 1024 * 1024
+MAX_HEADER_BYTES = 4096
+CLIENT_TIMEOUT = 30  # seconds a client may stall while sending its header or upload
+KEEPALIVE_INTERVAL = 10  # seconds between keepalives to a booth waiting on its job
+MAX_COPIES = 10
+ALLOWED_JOB_OPTIONS = {'PageSize', 'media', 'CutMedia', 'StpCutType'}
+MAX_OPTION_LENGTH = 64
+
+
+def clean_job_options(options):
+    """Keep only whitelisted CUPS job options with short scalar values."""
+    if not isinstance(options, dict):
+        return {}
+    cleaned = {}
+    for key, value in options.items():
+        if key not in ALLOWED_JOB_OPTIONS or not isinstance(value, (str, int)):
+            logger.warning("Dropping job option %r", key)
+            continue
+        value = str(value)
+        if len(value) <= MAX_OPTION_LENGTH:
+            cleaned[key] = value
+    return cleaned
+
+
+def _peer_allowed(family, addr):
+    """Unix sockets are local; TCP peers must be on a loopback or private network."""
+    if family != socket.AF_INET:
+        return True
+    try:
+        ip = ipaddress.ip_address(addr[0])
+    except ValueError:
+        return False
+    return ip.is_loopback or ip.is_private
+
+
+def parse_address(address):
+    """
+    Parse 'unix:/path/to.sock' or 'tcp:host:port' into (family, sockaddr).
+    A bare '/path' is treated as a Unix socket; 'tcp::port' binds to loopback
+    only, so serving the LAN needs an explicit host such as the booth
+    network's address.
+    """
+    if address.startswith('unix:'):
+        return socket.AF_UNIX, address[len('unix:'):]
+    if address.startswith('/'):
+        return socket.AF_UNIX, address
+    if address.startswith('tcp:'):
+        host, _, port = address[len('tcp:'):].rpartition(':')
+        return socket.AF_INET, (host or '127.0.0.1', int(port))
+    raise ValueError("Unknown print server address: %s" % address)
+
+
+def _send(sock, lock, message):
+    with lock:
+        sock.sendall((json.dumps(message) + '\n').encode('utf-8'))
+
+
+class _Job:
+    def __init__(self, path, copies, options, send):
+        self.path = path
+        self.copies = copies
+        self.options = options
+        self.send = send
+        self.tried = set()  # printers that already failed this job
+        self.ok = False
+        self.done = threading.Event()
+
+
+class PrintServer:
+    """
+    Accept print jobs from booth clients and schedule them across printers.
+
+    Every printer has a worker thread pulling from one shared queue, so a job
+    goes to whichever printer frees up first. A failed job is re-queued for
+    the printers that have not tried it yet; it fails once every printer in
+    the pool has failed it.
+
+    `printers` is a list of objects with the printer.Printer interface
+    (print_file, check_paper_status, _printer_name).
+    """
+
+    def __init__(self, address, printers, spool_dir=None):
+        self.address = address
+        self.printers = list(printers)
+        self.spool_dir = spool_dir or tempfile.mkdtemp(prefix='photobooth-spool-')
+        self.jobs_completed = 0
+        self.jobs_failed = 0
+        self._queue = queue.Queue()
+        self._lock = threading.Lock()
+        self._sock = None
+        self._started = None
+
+    def start(self):
+        """Bind the socket and start the accept and printer worker threads."""
+        family, sockaddr = parse_address(self.address)
+        if family == socket.AF_UNIX and os.path.exists(sockaddr):
+            os.remove(sockaddr)  # stale socket from a previous run
+        self._sock = socket.socket(family, socket.SOCK_STREAM)
+        if family == socket.AF_INET:
+            self._sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        self._sock.bind(sockaddr)
+        self._sock.listen(16)
+        self._started = time.monotonic()
+
+        for index, printer in enumerate(self.printers):
+            threading.Thread(target=self._print_worker, args=(printer,),
+                             name='printer-%d' % index, daemon=True).start()
+        threading.Thread(target=self._accept_loop, name='print-accept', daemon=True).start()
+        logger.info("Print server listening on %s with %d printer(s)",
+                    self.address, len(self.printers))
+
+    def stop(self):
+        """Stop accepting connections."""
+        if self._sock:
+            self._sock.close()
+            self._sock = None
+
+    def prints_per_hour(self):
+        """Aggregate completed jobs per hour since start()."""
+        if self._started is None:
+            return 0.0
+        elapsed = max(time.monotonic() - self._started, 1e-6)
+        return self.jobs_completed * 3600.0 / elapsed
+
+    def _accept_loop(self):
+        family = self._sock.family
+        while self._sock is not None:
+            try:
+                conn, addr = self._sock.accept()
+            except OSError:
+                return
+            if not _peer_allowed(family, addr):
+                logger.warning("Refused print client %s", addr)
+                conn.close()
+                continue
+            threading.Thread(target=self._handle, args=(conn,),
+                             name='print-client', daemon=True).start()
+
+    def _handle(self, conn):
+        send_lock = threading.Lock()
+        try:
+            conn.settimeout(CLIENT_TIMEOUT)
+            with conn, conn.makefile('rb') as rfile:
+                line = rfile.readline(MAX_HEADER_BYTES)
+                if not line.endswith(b'\n'):
+                    logger.warning("Dropping client with a missing or oversized header")
+                    return
+                header = json.loads(line.decode('utf-8'))
+                if not isinstance(header, dict):
+                    return
+                if header.get('op') == 'status':
+                    _send(conn, send_lock, self._status())
+                    return
+                if header.get('op') != 'print':
+                    _send(conn, send_lock, {'done': True, 'ok': False,
+                                            'error': 'unknown op'})
+                    return
+
+                size = int(header['size'])
+                copies = int(header.get('copies', 1))
+                if not 0 < size <= MAX_UPLOAD_BYTES or not 1 <= copies <= MAX_COPIES:
+                    _send(conn, send_lock, {'done': True, 'ok': False,
+                                            'error': 'size or copies out of range'})
+                    return
+
+                path = self._receive(rfile, size,
+                                     os.path.basename(str(header.get('name', 'job.jpg'))))
+                job = _Job(path, copies, clean_job_options(header.get('options')),
+                           lambda message: _send(conn, send_lock, message))
+                job.send({'status': "Queued (%d ahead)" % self._queue.qsize()})
+                self._queue.put(job)
+                # Let the booth tell a long queue from a dead server
+                while not job.done.wait(KEEPALIVE_INTERVAL):
+                    try:
+                        job.send({'keepalive': True})
+                    except OSError:
+                        pass  # booth went away; keep printing anyway
+                _send(conn, send_lock, {'done': True, 'ok': job.ok})
+        except Exception as e:
+            logger.warning("Print client error: %s", e)
+
+    def _receive(self, rfile, size, name):
+        fd, path = tempfile.mkstemp(dir=self.spool_dir, suffix='-' + name)
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                remaining = size
+                while remaining > 0:
+                    chunk = rfile.read(min(CHUNK_SIZE, remaining))
+                    if not chunk:
+                        raise IOError("upload ended early")
+                    f.write(chunk)
+                    remaining -= len(chunk)
+        except Exception:
+            os.remove(path)
+            raise
+        return path
+
+    def _status(self):
+        paper_ok = any(p.check_paper_status() for p in self.printers)
+        return {
+            'printers': [p._printer_name for p in self.printers],
+            'paper_ok': paper_ok,
+            'queued': self._queue.qsize(),
+            'completed': self.jobs_completed,
+            'failed': self.jobs_failed,
+        }
+
+    def _print_worker(self, printer):
+        while True:
+            job = self._queue.get()
+            if printer in job.tried:
+                # Leave it for a printer that has not failed it yet
+                self._queue.put(job)
+                time.sleep(RETRY_HANDOFF_DELAY)
+                continue
+            job.tried.add(printer)
+
+            def on_status(msg):
+                try:
+                    job.send({'status': msg})
+                except OSError:
+                    pass  # booth went away; keep printing anyway
+
+            def on_eta(seconds):
+                try:
+                    job.send({'eta': seconds})
+                except OSError:
+                    pass
+
+            try:
+                ok = printer.print_file(job.path, on_status=on_status, copies=job.copies,
+                                        options=job.options, on_eta=on_eta)
+            except Exception as e:
+                logger.warning("Printer %s error: %s", printer._printer_name, e)
+                ok = False
+
+            if not ok and len(job.tried) < len(self.printers):
+                on_status("Trying another printer...")
+                self._queue.put(job)
+                continue
+
+            with self._lock:
+                if ok:
+                    self.jobs_completed += 1
+                else:
+                    self.jobs_failed += 1
+            job.ok = ok
+            try:
+                os.remove(job.path)
+            except OSError:
+                pass
+            job.done.set()
+
+
+class RemotePrinter:
+    """
+    Booth-side client for PrintServer with the same interface as printer.Printer.
+
+    `timeout` bounds every socket operation, including each wait for the next
+    message while a job is queued or printing; the server's keepalives arrive
+    well within it, so only an unreachable server trips it.
+    """
+
+    def __init__(self, address, max_retries=3, retry_delay=5, timeout=30):
+        self.address = address
+        self.max_retries = max_retries  # retries happen on the server
+        self.retry_delay = retry_delay
+        self.timeout = timeout
+        self._printer_name = address
+
+    def _open(self):
+        family, sockaddr = parse_address(self.address)
+        sock = socket.socket(family, socket.SOCK_STREAM)
+        sock.settimeout(self.timeout)
+        sock.connect(sockaddr)
+        return sock
+
+    def _query_status(self):
+        with self._open() as sock, sock.makefile('rb') as rfile:
+            sock.sendall(b'{"op": "status"}\n')
+            return json.loads(rfile.readline().decode('utf-8'))
+
+    def is_available(self):
+        """Check that the print server is reachable and has printers. Returns True/False."""
+        try:
+            status = self._query_status()
+        except Exception as e:
+            logger.warning("Print server %s not available: %s", self.address, e)
+            return False
+        if not status.get('printers'):
+            return False
+        logger.info("Print server %s: %s", self.address, ', '.join(status['printers']))
+        return True
+
+    def check_paper_status(self):
+        """Ask the server whether any printer has paper."""
+        try:
+            return self._query_status().get('paper_ok', True)
+        except Exception:
+            return True
+
+    def print_file(self, filepath, on_status=None, copies=1, options=None, on_eta=None,
+                   on_submitted=None):
+        """
+        Upload a file to the print server and wait for the job to finish.
+        on_submitted() is called once the upload has been handed to the server.
+
+        Returns True if the job printed, False otherwise.
+        """
+        def status(msg):
+            logger.info(msg)
+            if on_status:
+                on_status(msg)
+
+        header = {
+            'op': 'print',
+            'name': os.path.basename(filepath),
+            'size': os.path.getsize(filepath),
+            'copies': copies,
+            'options': options or {},
+        }
+        try:
+            with self._open() as sock, sock.makefile('rb') as rfile:
+                sock.sendall((json.dumps(header) + '\n').encode('utf-8'))
+                with open(filepath, 'rb') as f:
+                    sock.sendfile(f)
+                if on_submitted:
+                    on_submitted()
+                for line in rfile:
+                    message = json.loads(line.decode('utf-8'))
+                    if message.get('keepalive'):
+                        continue
+                    if 'eta' in message:
+                        if on_eta:
+                            on_eta(message['eta'])
+                        continue
+                    if message.get('done'):
+                        if message.get('ok'):
+                            status("Print complete!")
+                            return True
+                        status("Printing failed!")
+                        return False
+                    status(message.get('status', ''))
+        except Exception as e:
+            status("Print error: %s" % e)
+            return False
+
+        status("Printing failed!")
+        return False
+
+
+#########################################
+# Simulation
+
+
+class FakePrinter:
+    """Printer stand-in that takes `seconds` per sheet."""
+
+    def __init__(self, name, seconds):
+        self._printer_name = name
+        self.seconds = seconds
+
+    def print_file(self, filepath, on_status=None, copies=1, options=None, on_eta=None,
+                   on_submitted=None):
+        if on_submitted:
+            on_submitted()
+        if on_eta:
+            on_eta(int(self.seconds * copies + 0.5))
+        if on_status:
+            on_status("Printing on %s..." % self._printer_name)
+        time.sleep(self.seconds * copies)
+        return True
+
+    def check_paper_status(self):
+        return True
+
+
+def simulate(booths, printers, jobs, print_seconds, image_kb):
+    """Run a server with fake printers and several booth clients; return prints per hour."""
+    work_dir = tempfile.mkdtemp(prefix='photobooth-sim-')
+    address = 'unix:' + os.path.join(work_dir, 'print.sock')
+    server = PrintServer(address, [FakePrinter('fake-%d' % i, print_seconds)
+                                   for i in range(printers)])
+    server.start()
+
+    image = os.path.join(work_dir, 'Final.jpg')
+    with open(image, 'wb') as f:
+        f.write(os.urandom(image_kb * 1024))
+
+    results = []
+
+    def booth(index):
+        client = RemotePrinter(address)
+        for _ in range(jobs):
+            results.append(client.print_file(image))
+
+    started = time.monotonic()
+    threads = [threading.Thread(target=booth, args=(i,)) for i in range(booths)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.monotonic() - started
+    server.stop()
+
+    rate = results.count(True) * 3600.0 / elapsed
+    print("%d booths, %d printers: %d/%d jobs ok in %.1fs, %.0f prints/hour"
+          % (booths, printers, results.count(True), len(results), elapsed, rate))
+    return rate
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Photo booth print server")
+    parser.add_argument('--listen', default='unix:/tmp/photobooth-print.sock',
+                        help="unix:/path or tcp:host:port")
+    parser.add_argument('--simulate', action='store_true',
+                        help="run with fake printers and simulated booth clients")
+    parser.add_argument('--booths', type=int, default=3)
+    parser.add_argument('--printers', type=int, default=2)
+    parser.add_argument('--jobs', type=int, default=10, help="jobs per simulated booth")
+    parser.add_argument('--print-seconds', type=float, default=0.5)
+    parser.add_argument('--image-kb', type=int, default=1500)
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.WARNING if args.simulate else logging.INFO,
+                        format='%(asctime)s %(name)s %(levelname)s: %(message)s')
+
+    if args.simulate:
+        simulate(args.booths, args.printers, args.jobs, args.print_seconds, args.image_kb)
+        return
+
+    # Imported here so simulations run on machines without pycups
+    from printer import Printer, PrintTimeModel, find_local_printers
+    names = find_local_printers()
+    if not names:
+        sys.exit("No local printers found")
+    model = PrintTimeModel(os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                                        '.print_model.json'))
+    server = PrintServer(args.listen, [Printer(printer_name=name, model=model)
+                                       for name in names])
+    server.start()
+    try:
+        while True:
+            time.sleep(60)
+            logger.info("%d printed, %d failed, %.0f prints/hour", server.jobs_completed,
+                        server.jobs_failed, server.prints_per_hour())
+    except KeyboardInterrupt:
+        server.stop()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,111 @@
+#!/usr/bin/env python3
+"""profiling.py -- On-demand sampling profiler and tracemalloc report."""
+
+import os
+import sys
+import time
+import signal
+import logging
+import datetime
+import threading
+import tracemalloc
+from collections import Counter
+
+logger = logging.getLogger('photobooth.profiling')
+
+
+def _frame_label(frame):
+    code = frame.f_code
+    label = "%s (%s)" % (code.co_name, os.path.basename(code.co_filename))
+    return label.replace(';', ':')
+
+
+class Profiler:
+    """
+    Sample all thread stacks and trace allocations for a fixed number of seconds.
+
+    Nothing runs until start() is called (from a signal or key combo), so the
+    booth pays no cost while profiling is inactive. Results are written to
+    output_dir as a folded-stack file (for flamegraph.pl / speedscope) and a
+    top-allocations text report.
+    """
+
+    def __init__(self, output_dir, seconds=30, interval=0.005, top_allocations=25):
+        self.output_dir = output_dir
+        self.seconds = seconds
+        self.interval = interval
+        self.top_allocations = top_allocations
+        self._thread = None
+
+    def is_running(self):
+        return self._thread is not None and self._thread.is_alive()
+
+    def install_signal(self, signum=None):
+        """Start profiling whenever the process receives signum (default SIGUSR1)."""
+        if signum is None:
+            signum = getattr(signal, 'SIGUSR1', None)
+            if signum is None:
+                return
+        signal.signal(signum, lambda _signum, _frame: self.start())
+
+    def start(self):
+        """Begin a profiling run. Returns False if one is already in progress."""
+        if self.is_running():
+            return False
+        logger.info("Profiling for %ds", self.seconds)
+        tracemalloc.start(10)
+        self._thread = threading.Thread(target=self._run, name='profiler', daemon=True)
+        self._thread.start()
+        return True
+
+    def _run(self):
+        own_id = threading.get_ident()
+        names = {}
+        stacks = Counter()
+        samples = 0
+        end = time.monotonic() + self.seconds
+
+        while time.monotonic() < end:
+            for thread in threading.enumerate():
+                names[thread.ident] = thread.name
+            for thread_id, frame in sys._current_frames().items():
+                if thread_id == own_id:
+                    continue
+                labels = []
+                while frame is not None:
+                    labels.append(_frame_label(frame))
+                    frame = frame.f_back
+                labels.append(names.get(thread_id, str(thread_id)))
+                stacks[';'.join(reversed(labels))] += 1
+            samples += 1
+            time.sleep(self.interval)
+
+        snapshot = tracemalloc.take_snapshot()
+        tracemalloc.stop()
+
+        try:
+            self._write(stacks, samples, snapshot)
+        except Exception as e:
+            logger.warning("Could not write profile: %s", e)
+
+    def _write(self, stacks, samples, snapshot):
+        stamp = datetime.datetime.now().strftime("%Y%m%d-%H%M%S")
+        base = os.path.join(self.output_dir, "profile-%s" % stamp)
+
+        with open(base + '.folded', 'w') as f:
+            for stack, count in stacks.most_common():
+                f.write("%s %d\n" % (stack, count))
+
+        snapshot = snapshot.filter_traces([
+            tracemalloc.Filter(False, tracemalloc.__file__),
+            tracemalloc.Filter(False, '<frozen importlib._bootstrap>'),
+        ])
+        stats = snapshot.statistics('lineno')
+        total = sum(stat.size for stat in stats)
+        with open(base + '.allocs.txt', 'w') as f:
+            f.write("%d samples over %ds, %.1f KiB traced\n\n"
+                    % (samples, self.seconds, total / 1024.0))
+            for stat in stats[:self.top_allocations]:
+                f.write("%s\n" % stat)
+
+        logger.info("Profile written to %s.folded and %s.allocs.txt", base, base)
@@ -4,6 +4,8 @@
 import tkinter as tk
 from tkinter import ttk
 from config import load_config, save_config, get_available_images
+from thumbnails import ThumbnailLoader, THUMB_SIZE
+from layout import LAYOUTS
 
 COLOR_PRESETS = {
     'Navy': [46, 65, 95],
@@ -86,13 +88,66 @@ def run_settings():
     all_images = get_available_images()
     screen_var = tk.StringVar(value=config['display']['screen_image'])
     ttk.Combobox(root, textvariable=screen_var, values=all_images,
-                 font=entry_font, state='readonly', width=28).place(x=250, y=180)
+                 font=entry_font, state='readonly', width=22).place(x=250, y=180)
 
     # --- Print Template ---
     tk.Label(root, text="Print Template:", **label_opts).place(x=30, y=230)
     template_var = tk.StringVar(value=config['printing']['template_image'])
     ttk.Combobox(root, textvariable=template_var, values=all_images,
-                 font=entry_font, state='readonly', width=28).place(x=250, y=230)
+                 font=entry_font, state='readonly', width=22).place(x=250, y=230)
+
+    # --- Image Previews (thumbnails load in the background) ---
+    small_label_opts = {'font': ('Helvetica', 11), 'bg': '#2c3e50', 'fg': '#ecf0f1'}
+    previews = {}
+    for key, x, caption in (('screen', 578, "Screen BG"), ('template', 690, "Template")):
+        canvas = tk.Canvas(root, width=THUMB_SIZE[0], height=THUMB_SIZE[1], bg='#34495e',
+                           highlightthickness=1, highlightbackground='#ecf0f1')
+        canvas.place(x=x, y=165)
+        tk.Label(root, text=caption, **small_label_opts).place(x=x, y=250)
+        previews[key] = canvas
+
+    preview_vars = {'screen': screen_var, 'template': template_var}
+    thumb_loader = ThumbnailLoader()
+    thumb_paths = {}   # filename -> cached thumbnail path (None if it failed)
+    thumb_images = {}  # filename -> tk.PhotoImage, kept alive for the canvases
+
+    def show_preview(key):
+        canvas = previews[key]
+        canvas.delete('all')
+        filename = preview_vars[key].get()
+        if filename not in thumb_paths:
+            canvas.create_text(THUMB_SIZE[0] // 2, THUMB_SIZE[1] // 2,
+                               text="...", fill='#ecf0f1')
+            return
+        if thumb_paths[filename] is None:
+            canvas.create_text(THUMB_SIZE[0] // 2, THUMB_SIZE[1] // 2,
+                               text="?", fill='#e74c3c')
+            return
+        if filename not in thumb_images:
+            thumb_images[filename] = tk.PhotoImage(file=thumb_paths[filename])
+        canvas.create_image(THUMB_SIZE[0] // 2 + 1, THUMB_SIZE[1] // 2 + 1,
+                            image=thumb_images[filename])
+
+    def poll_thumbnails():
+        done = thumb_loader.poll()
+        for filename, thumb_path in done:
+            thumb_paths[filename] = thumb_path
+        if done:
+            for key in previews:
+                show_preview(key)
+        root.after(100, poll_thumbnails)
+
+    for key, var in preview_vars.items():
+        var.trace_add('write', lambda *_args, key=key: show_preview(key))
+        show_preview(key)
+
+    # Current selections first, then the rest so switching is instant
+    wanted = [screen_var.get(), template_var.get()]
+    wanted += [f for f in all_images if f not in wanted]
+    for filename in wanted:
+        thumb_loader.request(filename)
+    thumb_loader.prune(all_images)
+    root.after(100, poll_thumbnails)
 
     # --- Paper Tray Count ---
     tk.Label(root, text="Paper Tray Count:", **label_opts).place(x=30, y=280)
@@ -100,6 +155,12 @@ def run_settings():
     tk.Spinbox(root, from_=1, to=50, textvariable=tray_var,
                font=entry_font, width=5).place(x=250, y=280)
 
+    # --- Print Layout ---
+    tk.Label(root, text="Layout:", **label_opts).place(x=400, y=280)
+    layout_var = tk.StringVar(value=config['printing']['layout'])
+    ttk.Combobox(root, textvariable=layout_var, values=list(LAYOUTS.keys()),
+                 font=entry_font, state='readonly', width=12).place(x=490, y=280)
+
     # --- Reset Paper Counter ---
     tk.Label(root, text="Prints Done:", **label_opts).place(x=30, y=330)
     prints_label = tk.Label(root, text=str(config['state']['images_printed']),
@@ -109,6 +170,7 @@ def run_settings():
     def reset_counter():
         config['state']['images_printed'] = 0
         config['state']['paper_bundles_loaded'] = 1
+        config['state']['sheets_printed'] = 0
         prints_label.configure(text='0')
 
     tk.Button(root, text="Reset Counter", command=reset_counter,
@@ -123,6 +185,7 @@ def run_settings():
         config['display']['screen_image'] = screen_var.get()
         config['printing']['template_image'] = template_var.get()
         config['printing']['paper_tray_count'] = tray_var.get()
+        config['printing']['layout'] = layout_var.get()
         save_config(config)
         root.destroy()
 
@@ -0,0 +1,340 @@
+#!/usr/bin/env python3
+"""soak.py -- Endurance test: drive thousands of simulated sessions and watch for leaks.
+
+Runs the real waitingforbutton()/takepictures() code from photoBooth.py with a
+fake camera, CUPS connection and GPIO, headless pygame and no-op sleeps. RSS,
+open file descriptors, per-frame time and per-session latency are sampled over
+the run; the exit status is 1 if any of them trends upward beyond the threshold.
+
+    ./soak.py --sessions 2000 --threshold 0.2 --csv soak.csv
+"""
+
+import os
+import sys
+import time
+import types
+import shutil
+import logging
+import argparse
+import tempfile
+
+logger = logging.getLogger('photobooth.soak')
+
+PRESS_AFTER_FRAMES = 5  # frames of preview before the fake button is pressed
+ASSET_EXTENSIONS = ('.yml', '.jpg', '.jpeg', '.png', '.mp3')  # copied into the work dir
+
+
+#########################################
+# Fakes
+
+
+class FakeGPIO(types.ModuleType):
+    """RPi.GPIO stand-in. The button reads LOW once every PRESS_AFTER_FRAMES reads."""
+
+    BOARD = 10
+    IN = 1
+    OUT = 0
+    PUD_UP = 22
+    HIGH = 1
+    LOW = 0
+
+    def __init__(self):
+        super().__init__('RPi.GPIO')
+        self._reads = 0
+
+    def setmode(self, mode):
+        pass
+
+    def setup(self, pin, direction, pull_up_down=None):
+        pass
+
+    def output(self, pin, value):
+        pass
+
+    def input(self, pin):
+        self._reads += 1
+        return self._reads % PRESS_AFTER_FRAMES != 0
+
+
+class FakeFrame:
+    """Minimal stand-in for a numpy RGB frame as used by show_camera_preview()."""
+
+    def __init__(self, width, height):
+        self.data = bytes(width * height * 3)
+        self.shape = (height, width, 3)
+
+
+class FakeRequest:
+    def __init__(self, array):
+        self.array = array
+
+    def release(self):
+        pass
+
+
+class FakeMappedArray:
+    """picamera2.MappedArray stand-in exposing the request's frame."""
+
+    def __init__(self, request, stream):
+        self.array = request.array
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+class FakePicamera2:
+    def __init__(self):
+        self._still = None
+        self._preview = None
+
+    def create_preview_configuration(self, main, transform=None):
+        return {'main': main}
+
+    def create_still_configuration(self, main, transform=None):
+        return {'main': main}
+
+    def configure(self, config):
+        width, height = config['main']['size']
+        self._preview = FakeFrame(width, height)
+
+    def start(self):
+        pass
+
+    def switch_mode(self, config):
+        pass
+
+    def capture_array(self):
+        return self._preview
+
+    def switch_mode_and_capture_request(self, config):
+        if self._still is None:
+            import numpy as np
+            width, height = config['main']['size']
+            self._still = np.full((height, width, 4), 100, dtype=np.uint8)
+        return FakeRequest(self._still)
+
+
+class FakeCupsConnection:
+    """Accepts every job and reports it completed on the first poll."""
+
+    _next_job = 1
+
+    def getPrinters(self):
+        return {'SoakPrinter': {
+            'device-uri': 'usb://soak/printer',
+            'printer-state': 3,
+            'printer-state-message': '',
+            'printer-is-accepting-jobs': True,
+        }}
+
+    def getJobs(self, which_jobs='not-completed', requested_attributes=None):
+        return {}
+
+    def printFile(self, printer, filename, title, options):
+        job_id = FakeCupsConnection._next_job
+        FakeCupsConnection._next_job += 1
+        return job_id
+
+    def cancelJob(self, job_id):
+        pass
+
+    def enablePrinter(self, name):
+        pass
+
+    def acceptJobs(self, name):
+        pass
+
+    def setJobHoldUntil(self, job_id, value):
+        pass
+
+
+class FastTime(types.ModuleType):
+    """`time` module replacement whose sleep() returns immediately."""
+
+    def __init__(self):
+        super().__init__('time')
+        self.__dict__.update({k: getattr(time, k) for k in dir(time)
+                              if not k.startswith('__') and k != 'sleep'})
+
+    def sleep(self, seconds):
+        pass
+
+
+def install_fakes():
+    """Register fake hardware modules so photoBooth.py imports without hardware."""
+    rpi = types.ModuleType('RPi')
+    rpi.GPIO = FakeGPIO()
+    sys.modules['RPi'] = rpi
+    sys.modules['RPi.GPIO'] = rpi.GPIO
+
+    picamera2 = types.ModuleType('picamera2')
+    picamera2.Picamera2 = FakePicamera2
+    picamera2.MappedArray = FakeMappedArray
+    sys.modules['picamera2'] = picamera2
+
+    libcamera = types.ModuleType('libcamera')
+    libcamera.Transform = lambda **kwargs: kwargs
+    sys.modules['libcamera'] = libcamera
+
+    cups = types.ModuleType('cups')
+    cups.Connection = FakeCupsConnection
+    sys.modules['cups'] = cups
+
+
+#########################################
+# Metrics
+
+
+def open_fds():
+    """Number of open file descriptors, or 0 if it cannot be determined."""
+    for path in ('/proc/self/fd', '/dev/fd'):
+        try:
+            return len(os.listdir(path))
+        except OSError:
+            continue
+    return 0
+
+
+def trend(values):
+    """
+    Relative growth of a least-squares line fitted through values, from its
+    first to its last point. 0.25 means the metric grew by 25% over the run.
+    """
+    n = len(values)
+    if n < 2:
+        return 0.0
+    mean_x = (n - 1) / 2.0
+    mean_y = sum(values) / float(n)
+    var_x = sum((x - mean_x) ** 2 for x in range(n))
+    slope = sum((x - mean_x) * (y - mean_y) for x, y in enumerate(values)) / var_x
+    start = mean_y - slope * mean_x
+    return slope * (n - 1) / max(abs(start), 1e-9)
+
+
+#########################################
+# Runner
+
+
+def run(sessions, threshold, samples, warmup, csv_path=None):
+    """Run the soak test. Returns True if no metric trended upward beyond threshold."""
+    project_dir = os.path.dirname(os.path.abspath(__file__))
+    work_dir = tempfile.mkdtemp(prefix='photobooth-soak-')
+    os.environ.setdefault('SDL_VIDEODRIVER', 'dummy')
+    os.environ.setdefault('SDL_AUDIODRIVER', 'dummy')
+    install_fakes()
+
+    sys.path.insert(0, project_dir)
+    import config
+    import settings_gui
+
+    # Work on private copies of booth.yml and the media so that nothing the
+    # booth writes next to them (print model, caches) lands in the real
+    # project directory, and skip the Tk settings screen
+    for entry in os.scandir(project_dir):
+        if entry.is_file() and entry.name.lower().endswith(ASSET_EXTENSIONS):
+            shutil.copy(entry.path, work_dir)
+    config.PROJECT_DIR = work_dir
+    config.CONFIG_FILE = os.path.join(work_dir, 'booth.yml')
+    settings_gui.run_settings = config.load_config
+
+    os.chdir(work_dir)
+    import photoBooth
+    import printer
+    from bufferpool import rss_bytes
+
+    photoBooth.time = FastTime()
+    printer.time = photoBooth.time
+    photoBooth.config['state']['paper_bundles_loaded'] = 10 ** 9
+    os.makedirs(photoBooth.foldername, exist_ok=True)
+
+    frame_times = []
+    session_times = []
+    last_flip = [time.perf_counter()]
+    real_flip = photoBooth.pygame.display.flip
+    real_takepictures = photoBooth.takepictures
+
+    def timed_flip():
+        real_flip()
+        now = time.perf_counter()
+        frame_times.append(now - last_flip[0])
+        last_flip[0] = now
+
+    def timed_takepictures():
+        start = time.perf_counter()
+        real_takepictures()
+        session_times.append(time.perf_counter() - start)
+        # Keep the disk footprint flat so only the process is measured
+        for name in os.listdir(photoBooth.foldername):
+            if name.endswith('.jpg'):
+                os.remove(os.path.join(photoBooth.foldername, name))
+
+    photoBooth.pygame.display.flip = timed_flip
+    photoBooth.takepictures = timed_takepictures
+
+    every = max(1, sessions // samples)
+    rows = []
+    started = time.perf_counter()
+    for n in range(1, sessions + 1):
+        photoBooth.waitingforbutton()
+        if n % every == 0:
+            rows.append({
+                'session': n,
+                'rss_mb': rss_bytes() / 1048576.0,
+                'fds': open_fds(),
+                'frame_ms': 1000.0 * sum(frame_times) / max(1, len(frame_times)),
+                'session_ms': 1000.0 * sum(session_times) / max(1, len(session_times)),
+            })
+            logger.info("session %d: rss=%.1fMB fds=%d frame=%.2fms session=%.1fms",
+                        n, rows[-1]['rss_mb'], rows[-1]['fds'],
+                        rows[-1]['frame_ms'], rows[-1]['session_ms'])
+            del frame_times[:]
+            del session_times[:]
+
+    elapsed = time.perf_counter() - started
+    photoBooth.pygame.quit()
+
+    if csv_path:
+        with open(csv_path, 'w') as f:
+            f.write("session,rss_mb,fds,frame_ms,session_ms\n")
+            for row in rows:
+                f.write("%(session)d,%(rss_mb).2f,%(fds)d,%(frame_ms).3f,%(session_ms).2f\n" % row)
+
+    # Ignore the warmup samples while caches fill up
+    measured = rows[int(len(rows) * warmup):]
+    passed = True
+    print("%d sessions in %.1fs" % (sessions, elapsed))
+    for metric in ('rss_mb', 'fds', 'frame_ms', 'session_ms'):
+        growth = trend([row[metric] for row in measured])
+        verdict = 'OK' if growth <= threshold else 'FAIL'
+        if growth > threshold:
+            passed = False
+        print("%-11s growth %+6.1f%%  %s" % (metric, growth * 100.0, verdict))
+
+    shutil.rmtree(work_dir, ignore_errors=True)
+    return passed
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Photo booth endurance test")
+    parser.add_argument('--sessions', type=int, default=2000)
+    parser.add_argument('--threshold', type=float, default=0.2,
+                        help="max allowed relative growth per metric (default 0.2)")
+    parser.add_argument('--samples', type=int, default=50,
+                        help="number of metric samples over the run")
+    parser.add_argument('--warmup', type=float, default=0.1,
+                        help="fraction of samples ignored at the start")
+    parser.add_argument('--csv', help="write samples to this CSV file")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO,
+                        format='%(asctime)s %(name)s %(levelname)s: %(message)s')
+    ok = run(args.sessions, args.threshold, args.samples, args.warmup,
+             csv_path=os.path.abspath(args.csv) if args.csv else None)
+    sys.exit(0 if ok else 1)
+
+
+if __name__ == '__main__':
+    main()
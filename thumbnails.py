@@ -0,0 +1,122 @@
+#!/usr/bin/env python3
+"""thumbnails.py -- On-disk thumbnail cache for the settings screen image pickers."""
+
+import os
+import queue
+import hashlib
+import logging
+import threading
+from PIL import Image
+
+from config import PROJECT_DIR
+
+logger = logging.getLogger('photobooth.thumbnails')
+
+CACHE_DIR = os.path.join(PROJECT_DIR, '.thumbcache')
+THUMB_SIZE = (104, 78)
+
+
+def _cache_key(path, st):
+    """Build a cache key from the image path, modification time and size."""
+    raw = '%s|%d|%d|%dx%d' % (path, st.st_mtime_ns, st.st_size, THUMB_SIZE[0], THUMB_SIZE[1])
+    return hashlib.sha1(raw.encode('utf-8')).hexdigest()
+
+
+def get_thumbnail_path(path):
+    """
+    Return the path of a cached thumbnail for an image, generating it if needed.
+
+    Thumbnails are stored as small PNGs in CACHE_DIR. A changed source file gets
+    a new key, so stale entries are simply never looked up again.
+    """
+    st = os.stat(path)
+    thumb_path = os.path.join(CACHE_DIR, _cache_key(path, st) + '.png')
+    if os.path.exists(thumb_path):
+        return thumb_path
+
+    os.makedirs(CACHE_DIR, exist_ok=True)
+    with Image.open(path) as img:
+        img.draft('RGB', THUMB_SIZE)  # fast JPEG downscale while decoding
+        img = img.convert('RGB')
+        img.thumbnail(THUMB_SIZE)
+        tmp_path = thumb_path + '.tmp'
+        img.save(tmp_path, 'PNG')
+    os.replace(tmp_path, thumb_path)
+    return thumb_path
+
+
+def prune_cache(filenames):
+    """
+    Delete cached thumbnails that do not belong to the current version of any
+    of `filenames` (project-relative). Returns the number of files removed.
+    """
+    keep = set()
+    for filename in filenames:
+        path = os.path.join(PROJECT_DIR, filename)
+        try:
+            keep.add(_cache_key(path, os.stat(path)) + '.png')
+        except OSError:
+            continue
+
+    removed = 0
+    try:
+        entries = os.listdir(CACHE_DIR)
+    except OSError:
+        return 0
+    for name in entries:
+        if name not in keep:
+            try:
+                os.remove(os.path.join(CACHE_DIR, name))
+                removed += 1
+            except OSError:
+                pass
+    return removed
+
+
+class ThumbnailLoader:
+    """
+    Generate thumbnails in a background thread.
+
+    Call request(filename) from the GUI thread; finished thumbnails are delivered
+    through poll(), which returns a list of (filename, thumb_path) pairs and is
+    meant to be called from a Tk after() callback so no Tk calls happen off the
+    main thread.
+    """
+
+    def __init__(self):
+        self._requests = queue.Queue()
+        self._results = queue.Queue()
+        self._thread = threading.Thread(target=self._run, name='thumbnails', daemon=True)
+        self._thread.start()
+
+    def request(self, filename):
+        """Queue a thumbnail for an image in the project directory."""
+        self._requests.put(filename)
+
+    def prune(self, filenames):
+        """Queue removal of cache entries not matching the given images."""
+        self._requests.put(list(filenames))
+
+    def poll(self):
+        """Return all thumbnails finished since the last call."""
+        done = []
+        while True:
+            try:
+                done.append(self._results.get_nowait())
+            except queue.Empty:
+                return done
+
+    def _run(self):
+        while True:
+            filename = self._requests.get()
+            if isinstance(filename, list):
+                removed = prune_cache(filename)
+                if removed:
+                    logger.info("Pruned %d stale thumbnail(s)", removed)
+                continue
+            try:
+                thumb_path = get_thumbnail_path(os.path.join(PROJECT_DIR, filename))
+            except Exception as e:
+                logger.warning("Could not create thumbnail for %s: %s", filename, e)
+                thumb_path = None
+            self._results.put((filename, thumb_path))
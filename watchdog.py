@@ -0,0 +1,148 @@
+#!/usr/bin/env python3
+"""watchdog.py -- Main-loop stall detection and per-state latency tracking."""
+
+import os
+import sys
+import time
+import logging
+import datetime
+import threading
+import traceback
+from collections import deque
+
+logger = logging.getLogger('photobooth.watchdog')
+
+
+def _percentile(sorted_values, pct):
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, int(round(pct / 100.0 * (len(sorted_values) - 1))))
+    return sorted_values[index]
+
+
+class Watchdog:
+    """
+    Watch a heartbeat from the main loop and record how long each booth state lasts.
+
+    The main loop calls beat(state) regularly. If no beat arrives within
+    `budget` seconds (or the state's entry in `beat_budgets`, for states that
+    legitimately block such as waiting on a print job), or a state lasts longer
+    than its entry in `state_budgets`, the stacks of all threads and the
+    current state are appended to watchdog.log in output_dir (once per stall).
+
+    Durations of completed states are kept in a rolling window for p50/p95/p99.
+    `slos` maps a state name to a target p95 in seconds. The booth reports
+    'printing' from the finished capture until CUPS (or the print server) has
+    accepted the job, and 'print_wait' while it waits for the job to finish;
+    e.g. {'printing': 3.0} means a composite is queued on the printer within
+    3 s of the last photo.
+    """
+
+    def __init__(self, output_dir, budget=10.0, state_budgets=None, slos=None, window=500,
+                 beat_budgets=None):
+        self.output_dir = output_dir
+        self.budget = budget
+        self.state_budgets = dict(state_budgets or {})
+        self.beat_budgets = dict(beat_budgets or {})
+        self.slos = dict(slos or {})
+        self.window = window
+        self._lock = threading.Lock()
+        self._last_beat = time.monotonic()
+        self._state = None
+        self._state_start = self._last_beat
+        self._durations = {}
+        self._stalled = False
+        self._thread = None
+
+    def start(self):
+        """Start the watchdog thread."""
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name='watchdog', daemon=True)
+            self._thread.start()
+
+    def beat(self, state=None):
+        """Record a heartbeat, optionally entering a new state."""
+        now = time.monotonic()
+        finished = None
+        with self._lock:
+            self._last_beat = now
+            self._stalled = False
+            if state is not None and state != self._state:
+                if self._state is not None:
+                    finished = (self._state, now - self._state_start)
+                    durations = self._durations.setdefault(self._state, deque(maxlen=self.window))
+                    durations.append(finished[1])
+                self._state = state
+                self._state_start = now
+
+        if finished:
+            self._check_slo(*finished)
+
+    def percentiles(self, state):
+        """Return (count, p50, p95, p99) in seconds for a state."""
+        with self._lock:
+            values = sorted(self._durations.get(state, ()))
+        return (len(values), _percentile(values, 50),
+                _percentile(values, 95), _percentile(values, 99))
+
+    def report(self):
+        """Return a multi-line latency summary for all recorded states."""
+        with self._lock:
+            states = sorted(self._durations)
+        lines = []
+        for state in states:
+            count, p50, p95, p99 = self.percentiles(state)
+            line = "%-14s n=%-5d p50=%6.2fs p95=%6.2fs p99=%6.2fs" % (state, count, p50, p95, p99)
+            if state in self.slos:
+                verdict = 'OK' if p95 <= self.slos[state] else 'MISS'
+                line += "  slo p95<=%.2fs %s" % (self.slos[state], verdict)
+            lines.append(line)
+        return "\n".join(lines)
+
+    def _check_slo(self, state, duration):
+        target = self.slos.get(state)
+        if target is None or duration <= target:
+            return
+        _count, _p50, p95, _p99 = self.percentiles(state)
+        logger.warning("SLO miss: %s took %.2fs (p95 %.2fs, target %.2fs)",
+                       state, duration, p95, target)
+
+    def _run(self):
+        while True:
+            time.sleep(max(0.1, self.budget / 4.0))
+            now = time.monotonic()
+            with self._lock:
+                if self._stalled:
+                    continue
+                state = self._state
+                since_beat = now - self._last_beat
+                in_state = now - self._state_start
+                state_budget = self.state_budgets.get(state)
+                beat_budget = self.beat_budgets.get(state, self.budget)
+                if since_beat > beat_budget:
+                    reason = "no heartbeat for %.1fs (budget %.1fs)" % (since_beat, beat_budget)
+                elif state_budget is not None and in_state > state_budget:
+                    reason = "state %s running %.1fs (budget %.1fs)" % (state, in_state, state_budget)
+                else:
+                    continue
+                self._stalled = True
+            self._dump(reason, state, in_state)
+
+    def _dump(self, reason, state, in_state):
+        logger.warning("Main loop stall: %s", reason)
+        names = {thread.ident: thread.name for thread in threading.enumerate()}
+        lines = [
+            "=== %s stall: %s" % (datetime.datetime.now().isoformat(timespec='seconds'), reason),
+            "state=%s for %.1fs" % (state, in_state),
+        ]
+        for thread_id, frame in sys._current_frames().items():
+            lines.append("--- thread %s (%d)" % (names.get(thread_id, '?'), thread_id))
+            lines.append("".join(traceback.format_stack(frame)).rstrip())
+        lines.append("--- latency")
+        lines.append(self.report())
+
+        try:
+            with open(os.path.join(self.output_dir, 'watchdog.log'), 'a') as f:
+                f.write("\n".join(lines) + "\n\n")
+        except Exception as e:
+            logger.warning("Could not write watchdog log: %s", e)